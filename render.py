@@ -1,40 +1,44 @@
 import os
 import sys
+import queue
+import threading
+import collections
+import atexit
 import argparse
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from PIL import Image
-import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from render_common import make_driver, wait_for_render, fit_window_to_content, capture_clip_png, save_capture
+
+# Initial viewport; fit_window_to_content grows it for pages that overflow
+WINDOW_WIDTH, WINDOW_HEIGHT = 1280, 800
 
 def get_union_bbox(driver, margin=20):
-    # Get bounding boxes of all visible elements except those with class 'bridge-diagram'
-    rects = driver.execute_script('''
-        var rects = [];
-        function isVisible(elem) {
-            var style = window.getComputedStyle(elem);
-            return style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetWidth > 0 && elem.offsetHeight > 0;
-        }
-        var all = document.body.getElementsByTagName('*');
+    # Union of the bounding boxes of all visible elements except those with class
+    # 'bridge-diagram', folded in the page so only four numbers cross the wire
+    bbox = driver.execute_script('''
+        var L = Infinity, T = Infinity, R = -Infinity, B = -Infinity;
+        var all = document.querySelectorAll('body *:not(.bridge-diagram)');
         for (var i = 0; i < all.length; i++) {
             var elem = all[i];
-            if (isVisible(elem) && !(elem.classList && elem.classList.contains('bridge-diagram'))) {
-                var r = elem.getBoundingClientRect();
-                rects.push({left: r.left, top: r.top, right: r.right, bottom: r.bottom});
-            }
+            // Cheap size check first; only pay for getComputedStyle on elements with a box.
+            // Written as a negated '> 0' so SVG/MathML elements (offsetWidth undefined) stay excluded
+            if (!(elem.offsetWidth > 0 && elem.offsetHeight > 0)) continue;
+            var style = window.getComputedStyle(elem);
+            if (style.display === 'none' || style.visibility === 'hidden') continue;
+            var r = elem.getBoundingClientRect();
+            if (r.left < L) L = r.left;
+            if (r.top < T) T = r.top;
+            if (r.right > R) R = r.right;
+            if (r.bottom > B) B = r.bottom;
         }
-        return rects;
+        if (L === Infinity) {
+            // fallback to body
+            var b = document.body.getBoundingClientRect();
+            return [b.left, b.top, b.right, b.bottom];
+        }
+        return [L, T, R, B];
     ''')
-    if not rects:
-        # fallback to body
-        rect = driver.execute_script('''
-            var r = document.body.getBoundingClientRect();
-            return {left: r.left, top: r.top, right: r.right, bottom: r.bottom};
-        ''')
-        rects = [rect]
-    left = min(r['left'] for r in rects)
-    top = min(r['top'] for r in rects)
-    right = max(r['right'] for r in rects)
-    bottom = max(r['bottom'] for r in rects)
+    left, top, right, bottom = bbox
     # Add margin
     left = max(int(left) - margin, 0)
     top = max(int(top) - margin, 0)
@@ -42,57 +46,134 @@ def get_union_bbox(driver, margin=20):
     bottom = int(bottom) + margin
     return left, top, right, bottom
 
-def render_and_crop_html_selenium(driver, html_path, output_img_path, margin=20):
+def capture_html_selenium(driver, html_path, margin=20):
     abs_html_path = os.path.abspath(html_path)
     driver.get('file://' + abs_html_path)
-    time.sleep(1)
+    wait_for_render(driver)
+    resized = fit_window_to_content(driver)
+
+    bbox = get_union_bbox(driver, margin)
+    png_bytes = capture_clip_png(driver, bbox)
+    if resized:
+        # The driver is reused for the next file; don't let one big page inflate the rest
+        driver.set_window_size(WINDOW_WIDTH, WINDOW_HEIGHT)
+    return png_bytes
+
+def render_and_crop_html_selenium(driver, html_path, output_img_path, margin=20):
+    png_bytes = capture_html_selenium(driver, html_path, margin)
+    save_capture(png_bytes, output_img_path)
+
+# One long-lived driver per worker process, reused for every file that worker handles
+_driver = None
+
+def _quit_driver():
+    global _driver
+    if _driver is not None:
+        _driver.quit()
+        _driver = None
+
+def _worker_init():
+    global _driver
+    _driver = make_driver(WINDOW_WIDTH, WINDOW_HEIGHT)
+    atexit.register(_quit_driver)
+
+def _worker(task):
+    html_path, output_img_path, margin = task
+    print(f"Processing {html_path} -> {output_img_path}")
+    png_bytes = capture_html_selenium(_driver, html_path, margin)
+    return png_bytes, output_img_path
 
-    screenshot_path = 'selenium_rendered.png'
-    driver.save_screenshot(screenshot_path)
+def capture_producer(tasks, q, workers, stop):
+    # 'spawn' gives each worker a clean interpreter (no forked Selenium state) and
+    # exits through sys.exit, so the atexit hook that quits Chrome actually runs
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_worker_init) as executor:
+        # Keep at most two captures per worker in flight; a new one is only submitted once
+        # an older result has been handed to the queue, so a full queue stalls capture
+        pending = collections.deque()
+        try:
+            for task in tasks:
+                if stop.is_set():
+                    break
+                if len(pending) >= 2 * workers:
+                    q.put(pending.popleft().result())
+                pending.append(executor.submit(_worker, task))
+            while pending and not stop.is_set():
+                q.put(pending.popleft().result())
+        except BaseException:
+            # Don't capture the rest of the directory only to throw the results away
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        if stop.is_set():
+            # A save failed; stop rendering pages whose results would be discarded
+            executor.shutdown(wait=True, cancel_futures=True)
 
-    left, top, right, bottom = get_union_bbox(driver, margin)
+def save_consumer(q, stop):
+    # Keep draining after a failure so the producer never blocks on a full queue,
+    # and flag the failure so the producer stops submitting captures
+    error = None
+    while True:
+        item = q.get()
+        if item is None:
+            break
+        if error is not None:
+            continue
+        try:
+            save_capture(*item)
+        except Exception as e:
+            error = e
+            stop.set()
+    if error is not None:
+        raise error
 
-    with Image.open(screenshot_path) as img:
-        cropped = img.crop((left, top, right, bottom))
-        if cropped.mode in ("RGBA", "LA"):
-            background = Image.new("RGB", cropped.size, (255, 255, 255))
-            background.paste(cropped, mask=cropped.split()[-1])
-            background.save(output_img_path)
-        else:
-            cropped.save(output_img_path)
-    os.remove(screenshot_path)
+def process_directory_selenium(directory, margin=20, force=False, workers=None, save_workers=2):
+    tasks = []
+    with os.scandir(directory) as it:
+        entries = [entry for entry in it if entry.is_file()]
+    # Existing outputs come from the same listing rather than an exists() call per file
+    existing_pngs = {entry.name for entry in entries if entry.name.endswith('.png')}
+    for entry in entries:
+        if entry.name.endswith('.html'):
+            html_path = entry.path
+            output_img_path = entry.path[:-5] + '.png'
+            if not force and entry.name[:-5] + '.png' in existing_pngs:
+                print(f"Skipping {html_path} (output exists)")
+                continue
+            tasks.append((html_path, output_img_path, margin))
+    if not tasks:
+        return
 
-def process_directory_selenium(directory, margin=20, force=False):
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--window-size=1920,1080')
-    chrome_options.add_argument('--no-sandbox')
-    driver = webdriver.Chrome(options=chrome_options)
-    try:
-        for filename in os.listdir(directory):
-            if filename.endswith('.html'):
-                html_path = os.path.join(directory, filename)
-                output_img_path = os.path.join(directory, filename[:-5] + '.png')
-                if not force and os.path.exists(output_img_path):
-                    print(f"Skipping {html_path} (output exists)")
-                    continue
-                print(f"Processing {html_path} -> {output_img_path}")
-                render_and_crop_html_selenium(driver, html_path, output_img_path, margin)
-    finally:
-        driver.quit()
+    if workers is None:
+        workers = max((os.cpu_count() or 2) // 2, 1)
+    workers = min(workers, len(tasks))
+    # Chrome capture feeds a bounded queue (with capture itself throttled by it); decode,
+    # composite and PNG encode run on separate threads so they overlap with the next capture
+    q = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=save_workers) as save_executor:
+        consumers = [save_executor.submit(save_consumer, q, stop) for _ in range(save_workers)]
+        try:
+            capture_producer(tasks, q, workers, stop)
+        finally:
+            for _ in consumers:
+                q.put(None)
+        for consumer in consumers:
+            consumer.result()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Batch render and crop HTML files in a directory using Selenium.")
     parser.add_argument("directory", help="Directory containing .html files")
     parser.add_argument("-m", "--margin", type=int, default=20, help="Margin in pixels around detected content")
     parser.add_argument("-f", "--force", action="store_true", help="Force overwrite of existing .png files")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of parallel Chrome workers (default: half the CPU count)")
     args = parser.parse_args()
 
     directory = args.directory
     margin = args.margin
     force = args.force
+    jobs = args.jobs
     if not os.path.isdir(directory):
         print(f"Error: {directory} is not a directory.")
         sys.exit(1)
-    process_directory_selenium(directory, margin, force)
+    process_directory_selenium(directory, margin, force, jobs)
@@ -1,36 +1,39 @@
 
-from html2image import Html2Image
-from PIL import Image
+from render_common import make_driver, wait_for_render, capture_clip_png, save_capture
 import os
 import sys
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 import argparse
 
-def render_and_crop_html(html_path, output_img_path, new_width=184, new_height=346, left_crop=None):
-    hti = Html2Image()
-    hti.screenshot(
-        html_file=html_path,
-        save_as='rendered.png',
-        size=(800, 600)
-    )
-    with Image.open('rendered.png') as img:
-        width, height = img.size
-        if left_crop is not None:
-            left = max(left_crop, 0)
-            right = left + new_width
-        else:
-            left = max((width - new_width) // 2, 0)
-            right = left + new_width
-        top = 0
-        bottom = min(new_height, height)
-        cropped = img.crop((left, top, right, bottom))
-        if cropped.mode in ("RGBA", "LA"):
-            background = Image.new("RGB", cropped.size, (255, 255, 255))
-            background.paste(cropped, mask=cropped.split()[-1])
-            background.save(output_img_path)
-        else:
-            cropped.save(output_img_path)
-    os.remove('rendered.png')
+# Viewport the pages are rendered at; the fixed crop box is laid out against it
+RENDER_WIDTH, RENDER_HEIGHT = 800, 600
+
+def compute_crop_box(new_width=184, new_height=346, left_crop=None):
+    # The viewport is fixed, so the box is the same for every file in a batch
+    if left_crop is not None:
+        left = max(left_crop, 0)
+    else:
+        left = max((RENDER_WIDTH - new_width) // 2, 0)
+    return left, 0, left + new_width, min(new_height, RENDER_HEIGHT)
+
+def render_and_crop_html(html_path, output_img_path, new_width=184, new_height=346, left_crop=None, driver=None, crop_box=None):
+    if crop_box is None:
+        crop_box = compute_crop_box(new_width, new_height, left_crop)
+    # Reuse the caller's driver when given; otherwise launch one just for this file
+    own_driver = driver is None
+    if own_driver:
+        driver = make_driver(RENDER_WIDTH, RENDER_HEIGHT, hide_scrollbars=True)
+    try:
+        driver.get('file://' + os.path.abspath(html_path))
+        wait_for_render(driver)
+        png_bytes = capture_clip_png(driver, crop_box)
+    finally:
+        if own_driver:
+            driver.quit()
+    save_capture(png_bytes, output_img_path)
 
 def parse_args(argc, argv):
     if argc >= 3:
@@ -59,16 +62,61 @@ def parse_args(argc, argv):
         left_crop = None
     return new_width, new_height, left_crop
 
-def process_directory(directory, new_width=184, new_height=346, left_crop=None, force=False):
-    for filename in os.listdir(directory):
-        if filename.endswith('.html'):
-            html_path = os.path.join(directory, filename)
-            output_img_path = os.path.join(directory, filename[:-5] + '.png')
-            if not force and os.path.exists(output_img_path):
+# One long-lived driver per worker process, reused for every file that worker handles
+_driver = None
+_crop_box = None
+
+def _quit_driver():
+    global _driver
+    if _driver is not None:
+        _driver.quit()
+        _driver = None
+
+def _worker_init(crop_box):
+    global _driver, _crop_box
+    _crop_box = crop_box
+    _driver = make_driver(RENDER_WIDTH, RENDER_HEIGHT, hide_scrollbars=True)
+    atexit.register(_quit_driver)
+
+def _worker(task):
+    html_path, output_img_path = task
+    print(f"Processing {html_path} -> {output_img_path}")
+    render_and_crop_html(html_path, output_img_path, driver=_driver, crop_box=_crop_box)
+
+def process_directory(directory, new_width=184, new_height=346, left_crop=None, force=False, workers=None):
+    crop_box = compute_crop_box(new_width, new_height, left_crop)
+    tasks = []
+    with os.scandir(directory) as it:
+        entries = [entry for entry in it if entry.is_file()]
+    # Existing outputs come from the same listing rather than an exists() call per file
+    existing_pngs = {entry.name for entry in entries if entry.name.endswith('.png')}
+    for entry in entries:
+        if entry.name.endswith('.html'):
+            html_path = entry.path
+            output_img_path = entry.path[:-5] + '.png'
+            if not force and entry.name[:-5] + '.png' in existing_pngs:
                 print(f"Skipping {html_path} (output exists)")
                 continue
-            print(f"Processing {html_path} -> {output_img_path}")
-            render_and_crop_html(html_path, output_img_path, new_width, new_height, left_crop)
+            tasks.append((html_path, output_img_path))
+    if not tasks:
+        return
+
+    if workers is None:
+        workers = max((os.cpu_count() or 2) // 2, 1)
+    workers = min(workers, len(tasks))
+    # 'spawn' gives each worker a clean interpreter (no forked Selenium state) and
+    # exits through sys.exit, so the atexit hook that quits Chrome actually runs
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_worker_init,
+                             initargs=(crop_box,)) as executor:
+        try:
+            for _ in executor.map(_worker, tasks):
+                pass
+        except BaseException:
+            # Don't render the rest of the directory after a failure
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Render and crop HTML files in a directory.")
@@ -77,6 +125,7 @@ if __name__ == "__main__":
     parser.add_argument("height", nargs="?", type=int, default=346, help="Height of crop")
     parser.add_argument("left_crop", nargs="?", type=int, help="Crop this many pixels from the left (optional)")
     parser.add_argument("-f", "--force", action="store_true", help="Force overwrite of existing .png files")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of parallel Chrome workers (default: half the CPU count)")
     args = parser.parse_args()
 
     directory = args.directory
@@ -87,4 +136,5 @@ if __name__ == "__main__":
     new_height = args.height
     left_crop = args.left_crop
     force = args.force
-    process_directory(directory, new_width, new_height, left_crop, force)
+    jobs = args.jobs
+    process_directory(directory, new_width, new_height, left_crop, force, jobs)
@@ -0,0 +1,90 @@
+import io
+import base64
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from PIL import Image
+
+def make_driver(width, height, hide_scrollbars=False):
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument(f'--window-size={width},{height}')
+    chrome_options.add_argument('--no-sandbox')
+    if hide_scrollbars:
+        # Keeps a tall page's scrollbar from shifting centred content under a fixed crop box
+        chrome_options.add_argument('--hide-scrollbars')
+    return webdriver.Chrome(options=chrome_options)
+
+def wait_for_render(driver, timeout=5):
+    # Poll until the document and its web fonts are done loading; a page still loading
+    # after `timeout` seconds is captured as-is rather than failing the batch
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.02).until(
+            lambda d: d.execute_script(
+                "return document.readyState === 'complete' && "
+                "(!document.fonts || document.fonts.status === 'loaded');"
+            )
+        )
+    except TimeoutException:
+        print(f"Warning: {driver.current_url} still loading after {timeout}s; capturing anyway")
+
+def fit_window_to_content(driver):
+    # Grow the window only when the page overflows it, so the content box is fully
+    # rasterized without paying for a monitor-sized viewport on every page
+    overflow_x, overflow_y = driver.execute_script('''
+        var d = document.documentElement;
+        return [d.scrollWidth - d.clientWidth, d.scrollHeight - d.clientHeight];
+    ''')
+    if overflow_x > 0 or overflow_y > 0:
+        # Ask WebDriver for the current size: window.outerWidth/outerHeight are 0 in old headless
+        size = driver.get_window_size()
+        driver.set_window_size(size['width'] + max(overflow_x, 0), size['height'] + max(overflow_y, 0))
+        return True
+    return False
+
+def capture_clip_png(driver, bbox):
+    # Have Chrome encode only the requested rectangle (CSS px) instead of the whole viewport.
+    # The clip is clamped to the viewport and any overhang padded back as transparent pixels,
+    # as a PIL crop of a full screenshot would, so it comes out white once flattened
+    left, top, right, bottom = bbox
+    view_w, view_h = driver.execute_script('return [window.innerWidth, window.innerHeight];')
+    clip_left, clip_top = min(left, view_w), min(top, view_h)
+    clip_right, clip_bottom = min(right, view_w), min(bottom, view_h)
+    png_bytes = None
+    if clip_right > clip_left and clip_bottom > clip_top:
+        result = driver.execute_cdp_cmd('Page.captureScreenshot', {
+            'format': 'png',
+            'clip': {'x': clip_left, 'y': clip_top, 'width': clip_right - clip_left,
+                     'height': clip_bottom - clip_top, 'scale': 1},
+        })
+        png_bytes = base64.b64decode(result['data'])
+        if (clip_right, clip_bottom) == (right, bottom):
+            return png_bytes
+
+    padded = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    if png_bytes is not None:
+        with Image.open(io.BytesIO(png_bytes)) as img:
+            padded.paste(img.convert("RGBA"), (clip_left - left, clip_top - top))
+    buf = io.BytesIO()
+    padded.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+def flatten_on_white(img):
+    # Paste onto white using the alpha band as mask (getchannel avoids split()'s four copies)
+    background = Image.new("RGB", img.size, (255, 255, 255))
+    background.paste(img, mask=img.getchannel("A"))
+    return background
+
+def save_capture(png_bytes, output_img_path):
+    # The capture is already clipped to the crop box; only transparency needs fixing up.
+    # Chrome always emits RGBA, so opacity is checked on the decoded alpha band
+    with Image.open(io.BytesIO(png_bytes)) as img:
+        if img.mode in ("RGBA", "LA"):
+            if img.getchannel("A").getextrema() == (255, 255):
+                img.convert("RGB").save(output_img_path, compress_level=1)
+            else:
+                flatten_on_white(img).save(output_img_path, compress_level=1)
+        else:
+            img.save(output_img_path, compress_level=1)
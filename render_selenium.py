@@ -1,9 +1,10 @@
 import os
 import sys
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from PIL import Image
-import time
+from render_common import make_driver, wait_for_render, fit_window_to_content, capture_clip_png, save_capture
+
+# Initial viewport; fit_window_to_content grows it for pages that overflow. The crop is the
+# <body> rectangle, which spans the viewport, so this width also sets the output width
+WINDOW_WIDTH, WINDOW_HEIGHT = 1920, 1080
 
 def get_visible_bbox(driver, margin=20):
     # Get bounding box of the body element
@@ -20,33 +21,19 @@ def get_visible_bbox(driver, margin=20):
     return left, top, right, bottom
 
 def render_and_crop_html_selenium(html_path, output_img_path, margin=20):
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--window-size=1920,1080')
-    chrome_options.add_argument('--no-sandbox')
-    driver = webdriver.Chrome(options=chrome_options)
+    driver = make_driver(WINDOW_WIDTH, WINDOW_HEIGHT)
 
     abs_html_path = os.path.abspath(html_path)
     driver.get('file://' + abs_html_path)
-    time.sleep(1)  # Wait for rendering
-
-    # Take full page screenshot
-    screenshot_path = 'selenium_rendered.png'
-    driver.save_screenshot(screenshot_path)
+    wait_for_render(driver)
+    fit_window_to_content(driver)
 
-    left, top, right, bottom = get_visible_bbox(driver, margin)
+    # Screenshot just the visible content box (kept in memory)
+    bbox = get_visible_bbox(driver, margin)
+    png_bytes = capture_clip_png(driver, bbox)
     driver.quit()
 
-    with Image.open(screenshot_path) as img:
-        cropped = img.crop((left, top, right, bottom))
-        if cropped.mode in ("RGBA", "LA"):
-            background = Image.new("RGB", cropped.size, (255, 255, 255))
-            background.paste(cropped, mask=cropped.split()[-1])
-            background.save(output_img_path)
-        else:
-            cropped.save(output_img_path)
-    os.remove(screenshot_path)
+    save_capture(png_bytes, output_img_path)
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
@@ -21,51 +21,80 @@ NOTES:
 
 from __future__ import annotations
 import argparse
+import io
 import sys
-import pandas as pd
+import openpyxl
 from html import escape as html_escape
 
 
+def _read_rows(xlsx_path: str) -> list[list]:
+    """Read the active sheet as a list of rows of cell values (None for empty cells).
+    Rows are padded to a common width and trailing empty rows are dropped.
+    """
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # Read-only sheets trust the stored <dimension> tag, which can be stale; recompute it
+        ws.reset_dimensions()
+        rows = [list(r) for r in ws.iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()
+    width = max((len(r) for r in rows), default=0)
+    for r in rows:
+        r.extend([None] * (width - len(r)))
+    return rows
+
+
 def _first_non_empty(values) -> str:
     for v in values:
-        if pd.notna(v):
+        if v is not None:
             s = str(v).strip()
             if s:
                 return s
     return "Untitled"
 
 
-def _detect_last_used_col(df: pd.DataFrame) -> int:
+def _detect_last_used_col(rows: list[list]) -> int:
     """Return 0-based index of the last column that has any non-empty cell from row 2 onward.
     Falls back to the last non-empty col in header row if necessary.
     Raises if nothing is found.
     """
-    if df.shape[0] < 2:
+    if len(rows) < 2:
         raise ValueError("Excel must have at least two rows (title + headers).")
 
     # Any non-empty values from row index 1 (second row) downward
-    non_empty_any = df.iloc[1:].apply(lambda col: col.notna().any(), axis=0)
-    indices = [i for i, has_any in enumerate(non_empty_any) if has_any]
-
-    if not indices:
+    last = -1
+    for r in rows[1:]:
+        for i in range(len(r) - 1, last, -1):
+            if r[i] is not None:
+                last = i
+                break
+
+    if last < 0:
         # Fallback: look at header row (row 2)
-        header_non_empty = [i for i, v in enumerate(df.iloc[1].tolist()) if pd.notna(v) and str(v).strip()]
+        header_non_empty = [i for i, v in enumerate(rows[1]) if v is not None and str(v).strip()]
         if not header_non_empty:
             raise ValueError("No header cells found in row 2.")
         return max(header_non_empty)
 
-    return max(indices)
+    return last
 
 
 
 def _format_cell(v) -> str:
-  # Render numbers cleanly (e.g., 3.0 -> 3)
-  try:
-    if isinstance(v, float) and v.is_integer():
-      v = str(int(v))
-    else:
-      v = str(v)
-  except Exception:
+  # Render numbers cleanly (e.g., 3.0 -> 3); str and int cells (the common case)
+  # are dispatched on exact type before the float check
+  t = type(v)
+  if t is str:
+    pass
+  elif t is int:
+    v = str(v)
+  elif isinstance(v, float) and v.is_integer():
+    v = str(int(v))
+  else:
     v = str(v)
 
   # Escape HTML first, before adding our intentional HTML tags
@@ -80,27 +109,28 @@ def _format_cell(v) -> str:
 
 
 def xlsx_to_html(xlsx_path: str) -> str:
-    # Read with header=None so we can control rows precisely
-    df = pd.read_excel(xlsx_path, header=None, engine="openpyxl")
-    if df.empty:
+    # Read raw rows so we can control them precisely
+    sheet_rows = _read_rows(xlsx_path)
+    if not sheet_rows:
         raise ValueError("Excel file appears to be empty.")
 
     # Title = first non-empty cell from row 1
-    title = _first_non_empty(df.iloc[0].tolist())
+    title = _first_non_empty(sheet_rows[0])
 
     # Determine used columns and extract headers
-    last_col = _detect_last_used_col(df)
-    headers = ["" if pd.isna(x) else str(x) for x in df.iloc[1, : last_col + 1].tolist()]
+    last_col = _detect_last_used_col(sheet_rows)
+    headers = ["" if x is None else str(x) for x in sheet_rows[1][: last_col + 1]]
     ncols = len(headers)
 
     # Justification codes from row 3 (index 2)
-    just_codes = [str(x).strip().lower() if pd.notna(x) else 'l' for x in df.iloc[2, : last_col + 1].tolist()]
+    if len(sheet_rows) < 3:
+        raise ValueError("Excel must have a third row of justification codes (l, r, c).")
+    just_codes = [str(x).strip().lower() if x is not None else 'l' for x in sheet_rows[2][: last_col + 1]]
     just_map = {'l': 'left', 'r': 'right', 'c': 'center'}
     justs = [just_map.get(code, 'left') for code in just_codes]
 
     # Data rows (rows 4..N)
-    body_df = df.iloc[3:, : last_col + 1].fillna("")
-    rows = body_df.values.tolist()
+    rows = [["" if v is None else v for v in r[: last_col + 1]] for r in sheet_rows[3:]]
 
     # Build dynamic CSS for nowrap depending on column count
     if ncols >= 3:
@@ -126,14 +156,19 @@ def xlsx_to_html(xlsx_path: str) -> str:
         <tr>{thead_cells}</tr>
       </thead>"""
 
-    # Generate tbody with per-column justification
-    tbody_rows = []
-    for r in rows:
-        tds = "".join(
-            f"<td style='text-align:{justs[i]}'>{_format_cell(v)}</td>" for i, v in enumerate(r)
-        )
-        tbody_rows.append(f"        <tr>{tds}</tr>")
-    tbody_html = "\n".join(tbody_rows) if tbody_rows else "        <!-- No data rows -->"
+    # Generate tbody with per-column justification, streamed through a single buffer
+    td_opens = [f"<td style='text-align:{j}'>" for j in justs]
+    buf = io.StringIO()
+    for n, r in enumerate(rows):
+        if n:
+            buf.write("\n")
+        buf.write("        <tr>")
+        for td_open, v in zip(td_opens, r):
+            buf.write(td_open)
+            buf.write(_format_cell(v))
+            buf.write("</td>")
+        buf.write("</tr>")
+    tbody_html = buf.getvalue() if rows else "        <!-- No data rows -->"
 
     # Compose final HTML block
     html = f"""<!-- Auto-generated from {html_escape(xlsx_path)} -->
@@ -193,17 +228,29 @@ def xlsx_to_html(xlsx_path: str) -> str:
 
   <script>
     (function () {{
+      // <col> elements per table, looked up once rather than on every pass
+      const colCache = new WeakMap();
+      function getCols(table) {{
+        let cols = colCache.get(table);
+        if (!cols) {{
+          cols = table.querySelectorAll('colgroup col');
+          colCache.set(table, cols);
+        }}
+        return cols;
+      }}
+
       /** Equalize the widths of the first two columns to the larger of the two, per table. */
       function equalizeFirstTwoColumns(table) {{
-        const cols = table.querySelectorAll('colgroup col');
+        const cols = getCols(table);
         if (!cols || cols.length < 2) return;
 
         // Reset any previous widths before measuring
         cols[0].style.width = 'auto';
         cols[1].style.width = 'auto';
 
+        // Read phase: flush layout once, then measure every cell with no writes in between
+        table.getBoundingClientRect();
         let maxPx = 0;
-        // Measure headers + body cells in the first two columns
         for (const row of table.rows) {{
           for (let i = 0; i < 2; i++) {{
             const cell = row.cells[i];
@@ -213,6 +260,8 @@ def xlsx_to_html(xlsx_path: str) -> str:
             if (w > maxPx) maxPx = w;
           }}
         }}
+
+        // Write phase
         const px = Math.ceil(maxPx) + 'px';
         cols[0].style.width = px;
         cols[1].style.width = px;
@@ -222,15 +271,28 @@ def xlsx_to_html(xlsx_path: str) -> str:
         document.querySelectorAll('table.bridge-holdings').forEach(equalizeFirstTwoColumns);
       }}
 
-      // Initial run
-      if (document.readyState === 'loading') {{
-        document.addEventListener('DOMContentLoaded', equalizeAll);
-      }} else {{
+      // Initial run, once web fonts have settled (the table sits above this script,
+      // so it is already in the DOM); falls back to window load without the Font Loading API
+      if (document.fonts && document.fonts.ready) {{
+        document.fonts.ready.then(equalizeAll);
+      }} else if (document.readyState === 'complete') {{
         equalizeAll();
+      }} else {{
+        window.addEventListener('load', equalizeAll);
+      }}
+
+      // Coalesce bursts of resize events into at most one pass per animation frame
+      let rafId = 0;
+      function scheduleEqualize() {{
+        if (rafId) return;
+        rafId = requestAnimationFrame(() => {{
+          rafId = 0;
+          equalizeAll();
+        }});
       }}
-      // Re-run when fonts finish loading, on resize, and on load (helps with async layout shifts)
-      window.addEventListener('load', equalizeAll);
-      window.addEventListener('resize', equalizeAll);
+
+      // Re-run on resize
+      window.addEventListener('resize', scheduleEqualize);
 
       // Expose a helper so you can call it after dynamically injecting rows
       window.equalizeBridgeHoldingColumns = equalizeAll;